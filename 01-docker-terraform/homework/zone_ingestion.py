@@ -1,9 +1,6 @@
 
 
-import pandas as pd
 import click
-from sqlalchemy import create_engine
-from tqdm.auto import tqdm
 
 # Define data types for zone lookup CSV columns
 dtype = {
@@ -19,7 +16,7 @@ def ingest_data(
         engine,
         target_table: str,
         chunksize: int = 100000,
-) -> pd.DataFrame:
+) -> None:
     """
     Ingest CSV zone data into PostgreSQL database in chunks.
     
@@ -29,6 +26,10 @@ def ingest_data(
         target_table: Name of the target table in PostgreSQL
         chunksize: Number of rows to process in each chunk
     """
+    # Imported here so --help and --dry-run do not load pandas
+    import pandas as pd
+    from tqdm.auto import tqdm
+
     # Read CSV file with iterator to process in chunks
     df_iter = pd.read_csv(
         url,
@@ -80,12 +81,19 @@ def ingest_data(
 @click.option('--chunksize', default=100000, type=int, help='Chunk size for data ingestion')
 @click.option('--target-table', default='zones', help='Target table name')
 @click.option('--url', default='https://github.com/DataTalksClub/nyc-tlc-data/releases/download/misc/taxi_zone_lookup.csv', help='URL to the zone lookup CSV file')
+@click.option('--dry-run', is_flag=True, help='Only print what would be loaded where, without connecting')
 
 
-def main(pg_user, pg_pass, pg_host, pg_port, pg_db, chunksize, target_table, url):
+def main(pg_user, pg_pass, pg_host, pg_port, pg_db, chunksize, target_table, url, dry_run):
     """
     Main function to ingest taxi zone lookup data into PostgreSQL.
     """
+    if dry_run:
+        print(f"Dry run: {url} -> postgresql://{pg_user}:***@{pg_host}:{pg_port}/{pg_db} ({target_table})")
+        return
+
+    from sqlalchemy import create_engine
+
     # Create database engine connection
     engine = create_engine(f'postgresql://{pg_user}:{pg_pass}@{pg_host}:{pg_port}/{pg_db}')
 
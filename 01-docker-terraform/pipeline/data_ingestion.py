@@ -1,10 +1,22 @@
 #!/usr/bin/env python
 # coding: utf-8
 
-import pandas as pd
+from __future__ import annotations
+
+from contextlib import contextmanager
+from functools import cache, reduce
+from itertools import chain
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+from urllib.request import urlopen
+
 import click
-from sqlalchemy import create_engine
-from tqdm.auto import tqdm
+
+# pandas, pyarrow, SQLAlchemy and tqdm are imported inside the functions using them,
+# so --help, --dry-run and importing this script for tests stay fast
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
 
 dtype = {
     "VendorID": "Int64",
@@ -25,54 +37,378 @@ dtype = {
     "congestion_surcharge": "float64"
 }
 
-parse_dates = [
-    "tpep_pickup_datetime",
-    "tpep_dropoff_datetime"
+# Green (street-hail livery) files carry two extra columns
+dtypes = {
+    "yellow": dtype,
+    "green": {**dtype, "ehail_fee": "float64", "trip_type": "Int64"},
+}
+
+parse_dates = {
+    "yellow": ["tpep_pickup_datetime", "tpep_dropoff_datetime"],
+    "green": ["lpep_pickup_datetime", "lpep_dropoff_datetime"],
+}
+
+
+@cache
+def column_types(taxi: str) -> dict:
+    """Arrow type of every column of a taxi type's CSV."""
+    import pyarrow as pa
+
+    arrow_types = {
+        "Int64": pa.int64(),
+        "float64": pa.float64(),
+        "string": pa.string(),
+    }
+    return {
+        **{col: arrow_types[t] for col, t in dtypes[taxi].items()},
+        **{col: pa.timestamp("us") for col in parse_dates[taxi]},
+    }
+
+
+@cache
+def pandas_types() -> dict:
+    """Arrow -> pandas mapping that reproduces the nullable dtypes above."""
+    import pandas as pd
+    import pyarrow as pa
+
+    return {
+        pa.int64(): pd.Int64Dtype(),
+        pa.string(): pd.StringDtype(),
+    }
+
+release_url = "https://github.com/DataTalksClub/nyc-tlc-data/releases/download"
+
+# Same lookup that ../homework/zone_ingestion.py loads into the zones table
+zones_url = f"{release_url}/misc/taxi_zone_lookup.csv"
+
+
+def load_location_ids(url: str = zones_url) -> pa.Array:
+    """LocationIDs listed in the zone lookup; trips pointing anywhere else are unknown."""
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    with open_source(url) as source:
+        zones = pa_csv.read_csv(
+            source,
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=["LocationID"],
+                column_types={"LocationID": pa.int64()}
+            )
+        )
+    return zones["LocationID"].combine_chunks()
+
+
+@cache
+def validation_rules() -> dict:
+    """Each rule returns a boolean mask that is True for rows failing it."""
+    import pyarrow.compute as pc
+
+    return {
+        "null_vendor_id": lambda t, ids, dates: pc.is_null(t["VendorID"]),
+        "dropoff_before_pickup": lambda t, ids, dates: pc.less(t[dates[1]], t[dates[0]]).fill_null(False),
+        "negative_total_amount": lambda t, ids, dates: pc.less(t["total_amount"], 0).fill_null(False),
+        # is_in gives False for nulls, so a missing LocationID also counts as unknown
+        "unknown_pu_location": lambda t, ids, dates: pc.invert(pc.is_in(t["PULocationID"], value_set=ids)),
+        "unknown_do_location": lambda t, ids, dates: pc.invert(pc.is_in(t["DOLocationID"], value_set=ids)),
+    }
+
+
+def validate_chunk(table: pa.Table, location_ids: pa.Array, taxi: str = "yellow") -> tuple[pa.Table, pa.Table, dict[str, int]]:
+    """
+    Split a chunk into valid and quarantined rows.
+
+    Quarantined rows carry one boolean column per rule telling which checks
+    they failed; the returned dict counts failures per rule.
+    """
+    import pyarrow.compute as pc
+
+    masks = {rule: check(table, location_ids, parse_dates[taxi]) for rule, check in validation_rules().items()}
+    failed = reduce(pc.or_, masks.values())
+
+    quarantined = table.filter(failed)
+    for rule, mask in masks.items():
+        quarantined = quarantined.append_column(rule, mask.filter(failed))
+
+    counts = {rule: pc.sum(mask).as_py() or 0 for rule, mask in masks.items()}
+    return table.filter(pc.invert(failed)), quarantined, counts
+
+
+rollup_keys = ["pickup_hour", "pu_location_id"]
+
+rollup_sums = [
+    "fare_amount",
+    "tip_amount",
+    "total_amount",
+    "trip_distance"
 ]
 
 
-def ingest_data(
-        url: str,
-        engine,
-        target_table: str,
-        chunksize: int = 100000,
-) -> pd.DataFrame:
-    df_iter = pd.read_csv(
-        url,
-        dtype=dtype,
-        parse_dates=parse_dates,
-        iterator=True,
-        chunksize=chunksize
+def compute_rollup(df_chunk: pd.DataFrame, pickup_column: str) -> pd.DataFrame:
+    """Count trips and sum amounts per pickup hour and pickup zone for one chunk."""
+    return (
+        df_chunk
+        .assign(
+            pickup_hour=df_chunk[pickup_column].dt.floor("h"),
+            pu_location_id=df_chunk["PULocationID"],
+        )
+        .groupby(rollup_keys)
+        .agg(
+            trip_count=("pu_location_id", "size"),
+            **{col: (col, "sum") for col in rollup_sums}
+        )
     )
 
-    first_chunk = next(df_iter)
 
-    first_chunk.head(0).to_sql(
-        name=target_table,
-        con=engine,
+def merge_rollups(rollup: pd.DataFrame | None, chunk_rollup: pd.DataFrame) -> pd.DataFrame:
+    """Fold a chunk rollup into the running one; groups only grow with distinct hours x zones."""
+    import pandas as pd
+
+    if rollup is None:
+        return chunk_rollup
+    return pd.concat([rollup, chunk_rollup]).groupby(level=rollup_keys).sum()
+
+
+def upsert_rollup(rollup: pd.DataFrame, engine, rollup_table: str, taxi_type: str, source_file: str):
+    """
+    Replace this file's contribution to the rollup table.
+
+    Rows are keyed by source_file as well as (taxi_type, hour, zone) because
+    monthly files overlap at the edges (a January file holds some December 31
+    pickups); readers sum over source_file. Reloading a file deletes its old
+    rows first, so the result is the same however often it is loaded.
+    """
+    import pyarrow as pa
+
+    staging_table = f"{rollup_table}_staging"
+
+    rollup = rollup.reset_index()
+    rollup.insert(0, "source_file", source_file)
+    rollup.insert(0, "taxi_type", taxi_type)
+    write_table(
+        pa.Table.from_pandas(rollup, preserve_index=False),
+        engine,
+        staging_table,
         if_exists="replace"
     )
 
-    print(f"Table {target_table} created")
+    sum_columns = ",\n".join(f"{col} double precision" for col in rollup_sums)
+    columns = ", ".join(["taxi_type", "source_file", *rollup_keys, "trip_count", *rollup_sums])
+
+    execute_sql(
+        engine,
+        f"""
+            CREATE TABLE IF NOT EXISTS {rollup_table} (
+                taxi_type text,
+                source_file text,
+                pickup_hour timestamp,
+                pu_location_id bigint,
+                trip_count bigint,
+                {sum_columns},
+                PRIMARY KEY (taxi_type, source_file, pickup_hour, pu_location_id)
+            )
+        """,
+        f"""
+            DELETE FROM {rollup_table}
+            WHERE (taxi_type, source_file) IN (
+                SELECT DISTINCT taxi_type, source_file FROM {staging_table}
+            )
+        """,
+        f"""
+            INSERT INTO {rollup_table} ({columns})
+            SELECT {columns} FROM {staging_table}
+        """,
+        f"DROP TABLE {staging_table}",
+    )
 
-    first_chunk.to_sql(
-        name=target_table,
+    print(f"Replaced {source_file} in {rollup_table} with {len(rollup)} rollup rows")
+
+
+def is_duckdb(engine) -> bool:
+    from sqlalchemy import Engine
+
+    return not isinstance(engine, Engine)
+
+
+def connect(target: str):
+    """Return a DuckDB connection for duckdb:///path targets, a SQLAlchemy engine otherwise."""
+    from sqlalchemy import create_engine, make_url
+
+    url = make_url(target)
+    if url.drivername == "duckdb":
+        if not url.database:
+            raise click.BadParameter(f"expected duckdb:///path.duckdb, got {target}", param_hint="--target")
+        # Only needed for DuckDB targets, so the Postgres image does not have to ship it
+        import duckdb
+        return duckdb.connect(url.database)
+    return create_engine(url)
+
+
+def execute_sql(engine, *statements: str):
+    """Run statements in a single transaction on either target."""
+    if is_duckdb(engine):
+        engine.begin()
+        for statement in statements:
+            engine.execute(statement)
+        engine.commit()
+        return
+
+    from sqlalchemy import text
+
+    with engine.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+
+
+def write_table(table: pa.Table, engine, table_name: str, if_exists: str = "append", offset: int = 0):
+    """
+    Write an Arrow table to the target.
+
+    DuckDB scans the registered Arrow buffers directly; Postgres goes through
+    pandas/to_sql, with the index shifted by offset so it keeps counting rows
+    across chunks.
+    """
+    if is_duckdb(engine):
+        engine.register("arrow_chunk", table)
+        if if_exists == "replace":
+            engine.execute(f"CREATE OR REPLACE TABLE {table_name} AS SELECT * FROM arrow_chunk")
+        else:
+            engine.execute(f"INSERT INTO {table_name} SELECT * FROM arrow_chunk")
+        engine.unregister("arrow_chunk")
+        return
+
+    df = table.to_pandas(types_mapper=pandas_types().get)
+    df.index += offset
+    df.to_sql(
+        name=table_name,
         con=engine,
-        if_exists="append"
+        if_exists=if_exists
     )
 
-    print(f"Inserted first chunk: {len(first_chunk)}")
 
-    for df_chunk in tqdm(df_iter):
-        df_chunk.to_sql(
-            name=target_table,
-            con=engine,
-            if_exists="append"
-        )
-        print(f"Inserted chunk: {len(df_chunk)}")
+@contextmanager
+def open_source(url: str):
+    """Open a local path or HTTP(S) URL as an Arrow stream, gunzipping .gz on the fly."""
+    import pyarrow as pa
+
+    if not url.startswith(("http://", "https://")):
+        with pa.input_stream(url) as stream:
+            yield stream
+        return
+
+    with urlopen(url) as response, pa.PythonFile(response, mode="r") as stream:
+        if url.endswith(".gz"):
+            with pa.CompressedInputStream(stream, "gzip") as decompressed:
+                yield decompressed
+        else:
+            yield stream
+
+
+def read_chunks(url: str, chunksize: int, taxi: str = "yellow"):
+    """Stream the CSV as Arrow tables of chunksize rows (slicing is zero-copy)."""
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    convert_options = pa_csv.ConvertOptions(
+        column_types=column_types(taxi),
+        strings_can_be_null=True
+    )
+
+    # Close the reader and every stream under it once the generator finishes
+    with open_source(url) as source, pa_csv.open_csv(source, convert_options=convert_options) as reader:
+        pending = pa.Table.from_batches([], schema=reader.schema)
+        for batch in reader:
+            pending = pa.concat_tables([pending, pa.Table.from_batches([batch])])
+            while pending.num_rows >= chunksize:
+                yield pending.slice(0, chunksize)
+                pending = pending.slice(chunksize)
+
+        if pending.num_rows:
+            yield pending
+
+
+def ingest_data(
+        url: str,
+        engine,
+        target_table: str,
+        chunksize: int = 100000,
+        rollup_table: str | None = None,
+        validate: bool = False,
+        quarantine_table: str | None = None,
+        location_ids: pa.Array | None = None,
+        taxi: str = "yellow",
+        if_exists: str = "replace",
+) -> None:
+    """
+    Load one trip CSV(.gz) into target_table (plus quarantine and rollup tables).
+
+    taxi picks the column schema. With if_exists="append" the tables must
+    already exist (from an earlier load) and the rows are added to them.
+    """
+    from tqdm.auto import tqdm
+
+    rollup = None
+    pickup_column = parse_dates[taxi][0]
+    rollup_columns = [pickup_column, "PULocationID", *rollup_sums]
+    quarantine_table = quarantine_table or f"{target_table}_quarantine"
+    rule_counts = dict.fromkeys(validation_rules(), 0)
+    quarantined_rows = 0
+
+    chunks = read_chunks(url, chunksize, taxi)
+
+    first_chunk = next(chunks)
+
+    if validate and location_ids is None:
+        location_ids = load_location_ids()
+
+    if if_exists == "replace":
+        write_table(first_chunk.slice(0, 0), engine, target_table, if_exists="replace")
+        print(f"Table {target_table} created")
+
+        if validate:
+            _, empty_quarantine, _ = validate_chunk(first_chunk.slice(0, 0), location_ids, taxi)
+            write_table(empty_quarantine, engine, quarantine_table, if_exists="replace")
+            print(f"Table {quarantine_table} created")
+
+    inserted = 0
+
+    for chunk in tqdm(chain([first_chunk], chunks)):
+        if validate:
+            chunk, quarantined, counts = validate_chunk(chunk, location_ids, taxi)
+            write_table(quarantined, engine, quarantine_table, offset=quarantined_rows)
+            quarantined_rows += quarantined.num_rows
+            for rule, count in counts.items():
+                rule_counts[rule] += count
+
+        write_table(chunk, engine, target_table, offset=inserted)
+        inserted += chunk.num_rows
+        print(f"Inserted chunk: {chunk.num_rows}")
+
+        if rollup_table:
+            chunk_rollup = compute_rollup(chunk.select(rollup_columns).to_pandas(types_mapper=pandas_types().get), pickup_column)
+            rollup = merge_rollups(rollup, chunk_rollup)
 
     print(f'done ingesting to {target_table}')
 
+    if validate:
+        print(f"Quarantined {quarantined_rows} rows into {quarantine_table}")
+        for rule, count in rule_counts.items():
+            print(f"  {rule}: {count}")
+
+    if rollup_table:
+        source_file = url.rstrip("/").rsplit("/", 1)[-1]
+        # yellow_tripdata_2021-01.csv.gz -> yellow
+        taxi_type = source_file.split("_")[0]
+        upsert_rollup(rollup, engine, rollup_table, taxi_type, source_file)
+
+def hide_password(target: str) -> str:
+    """target with its password masked for printing, as SQLAlchemy's render_as_string(hide_password=True) does."""
+    parts = urlsplit(target)
+    if parts.password is None:
+        return target
+    userinfo, _, host = parts.netloc.rpartition("@")
+    return parts._replace(netloc=f"{userinfo.split(':', 1)[0]}:***@{host}").geturl()
+
+
 @click.command()
 @click.option('--year', required=True, type=int, help='Year of the data (e.g., 2021)')
 @click.option('--month', required=True, type=int, help='Month of the data (1-12)')
@@ -82,19 +418,44 @@ def ingest_data(
 @click.option('--pg-port', default='5432', help='PostgreSQL port')
 @click.option('--pg-db', default='ny_taxi', help='PostgreSQL database name')
 @click.option('--chunksize', default=100000, type=int, help='Chunk size for data ingestion')
-@click.option('--target-table', default='yellow_taxi_data', help='Target table name')
-@click.option('--url-prefix', default='https://github.com/DataTalksClub/nyc-tlc-data/releases/download/yellow', help='URL prefix for data files')
+@click.option('--taxi', default='yellow', type=click.Choice(list(dtypes)), help='Taxi type, which picks the file name and column schema')
+@click.option('--target-table', default=None, help='Target table name (defaults to <taxi>_taxi_data)')
+@click.option('--url-prefix', default=None, help='URL prefix for data files (defaults to the DataTalksClub release for --taxi)')
+@click.option('--rollup-table', default=None, help='Also maintain hourly trip/revenue rollups per pickup zone in this table')
+@click.option('--target', default=None, help='Target database URL, e.g. duckdb:///taxi.duckdb (defaults to the --pg-* PostgreSQL)')
+@click.option('--validate/--no-validate', default=False, help='Move rows failing data-quality rules to a quarantine table')
+@click.option('--quarantine-table', default=None, help='Quarantine table name (defaults to <target-table>_quarantine)')
+@click.option('--zones-url', default=zones_url, help='Zone lookup CSV listing the valid LocationIDs')
+@click.option('--dry-run', is_flag=True, help='Only print what would be loaded where, without connecting')
+
+
+def main(year, month, pg_user, pg_pass, pg_host, pg_port, pg_db, chunksize, taxi, target_table, url_prefix, rollup_table, target, validate, quarantine_table, zones_url, dry_run):
+    target = target or f'postgresql://{pg_user}:{pg_pass}@{pg_host}:{pg_port}/{pg_db}'
+    target_table = target_table or f'{taxi}_taxi_data'
+    url_prefix = url_prefix or f'{release_url}/{taxi}'
+    url = f'{url_prefix}/{taxi}_tripdata_{year:04d}-{month:02d}.csv.gz'
 
+    if dry_run:
+        tables = [target_table]
+        if validate:
+            tables.append(quarantine_table or f"{target_table}_quarantine")
+        if rollup_table:
+            tables.append(rollup_table)
+        print(f"Dry run: {url} -> {hide_password(target)} ({', '.join(tables)}) in chunks of {chunksize}")
+        return
 
-def main(year, month, pg_user, pg_pass, pg_host, pg_port, pg_db, chunksize, target_table, url_prefix):
-    engine = create_engine(f'postgresql://{pg_user}:{pg_pass}@{pg_host}:{pg_port}/{pg_db}')
-    url = f'{url_prefix}/yellow_tripdata_{year:04d}-{month:02d}.csv.gz'
+    engine = connect(target)
 
     ingest_data(
         url=url,
         engine=engine,
         target_table=target_table,
-        chunksize=chunksize
+        chunksize=chunksize,
+        rollup_table=rollup_table,
+        validate=validate,
+        quarantine_table=quarantine_table,
+        location_ids=load_location_ids(zones_url) if validate else None,
+        taxi=taxi
     )
 
 if __name__ == '__main__':
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Stream a monthly taxi CSV.gz from GitHub straight into PostgreSQL.
+
+Replaces the extract -> CopyIn -> UPDATE steps of the 04/05 postgres_taxi flows:
+the HTTP response is gunzipped incrementally, unique_row_id and filename are
+computed while the rows stream into COPY ... FROM STDIN, and the staging table
+is then merged into the final table. Nothing is written to local disk.
+"""
+
+import csv
+import gzip
+import hashlib
+import io
+import math
+from decimal import Decimal
+from operator import itemgetter
+
+import click
+import psycopg2
+import requests
+
+BASE_URL = "https://github.com/DataTalksClub/nyc-tlc-data/releases/download"
+
+# CSV columns copied into the staging table (same order as the CopyIn tasks they replace)
+COLUMNS = {
+    "yellow": [
+        "VendorID", "tpep_pickup_datetime", "tpep_dropoff_datetime", "passenger_count",
+        "trip_distance", "RatecodeID", "store_and_fwd_flag", "PULocationID", "DOLocationID",
+        "payment_type", "fare_amount", "extra", "mta_tax", "tip_amount", "tolls_amount",
+        "improvement_surcharge", "total_amount", "congestion_surcharge",
+    ],
+    "green": [
+        "VendorID", "lpep_pickup_datetime", "lpep_dropoff_datetime", "store_and_fwd_flag",
+        "RatecodeID", "PULocationID", "DOLocationID", "passenger_count", "trip_distance",
+        "fare_amount", "extra", "mta_tax", "tip_amount", "tolls_amount", "ehail_fee",
+        "improvement_surcharge", "total_amount", "payment_type", "trip_type",
+        "congestion_surcharge",
+    ],
+}
+
+# Columns hashed into unique_row_id, in the order of the flows' former UPDATE
+ID_COLUMNS = [
+    "VendorID", "{prefix}_pickup_datetime", "{prefix}_dropoff_datetime",
+    "PULocationID", "DOLocationID", "fare_amount", "trip_distance",
+]
+
+ROWS_PER_BLOCK = 10000
+
+
+def _pg_float_text(value: str) -> str:
+    """
+    Render a CSV number exactly as PostgreSQL casts double precision to text.
+
+    Both PostgreSQL (12+) and repr() print the shortest digits that round-trip,
+    but PostgreSQL switches to exponent notation when the decimal exponent is
+    below -4 or at least 15 (repr waits until 16) and never prints a trailing
+    '.0': 7.0 -> '7', 1e15 -> '1e+15', 0.00001 -> '1e-05'.
+    """
+    if value == "":
+        return value
+    number = float(value)
+    text = repr(number)
+    # Fast path for the usual fares and distances: no exponent, so repr already matches
+    if "e" not in text and (number == 0 or 1e-4 <= abs(number) < 1e15):
+        return text[:-2] if text.endswith(".0") else text
+    if math.isnan(number):
+        return "NaN"
+    if math.isinf(number):
+        return "Infinity" if number > 0 else "-Infinity"
+
+    sign, digits, exponent = Decimal(text).normalize().as_tuple()
+    digits = "".join(map(str, digits))
+    sign = "-" if sign else ""
+    point = len(digits) + exponent  # digits before the decimal point
+    decimal_exponent = point - 1
+
+    if decimal_exponent < -4 or decimal_exponent >= 15:
+        mantissa = digits[0] + (f".{digits[1:]}" if len(digits) > 1 else "")
+        return f"{sign}{mantissa}e{'-' if decimal_exponent < 0 else '+'}{abs(decimal_exponent):02d}"
+    if exponent >= 0:
+        return f"{sign}{digits}{'0' * exponent}"
+    if point > 0:
+        return f"{sign}{digits[:point]}.{digits[point:]}"
+    return f"{sign}0.{'0' * -point}{digits}"
+
+
+def unique_row_id(vendor_id, pickup, dropoff, pu_location_id, do_location_id, fare_amount, trip_distance) -> str:
+    """Same md5 as the flows' former UPDATE, so ids match rows already merged."""
+    key = (
+        vendor_id
+        + pickup
+        + dropoff
+        + pu_location_id
+        + do_location_id
+        + _pg_float_text(fare_amount)
+        + _pg_float_text(trip_distance)
+    )
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def staging_blocks(lines, taxi: str, filename: str):
+    """Yield CSV text blocks (unique_row_id, filename, *COLUMNS) ready for COPY."""
+    prefix = "tpep" if taxi == "yellow" else "lpep"
+
+    reader = csv.reader(lines)
+    position = {name: i for i, name in enumerate(next(reader))}
+    # Pick fields by index rather than building a dict per row
+    id_values = itemgetter(*(position[c.format(prefix=prefix)] for c in ID_COLUMNS))
+    copy_values = itemgetter(*(position[c] for c in COLUMNS[taxi]))
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    rows = []
+    for row in reader:
+        if not row:  # blank line, skipped like DictReader did
+            continue
+        rows.append((unique_row_id(*id_values(row)), filename, *copy_values(row)))
+        if len(rows) == ROWS_PER_BLOCK:
+            writer.writerows(rows)
+            rows.clear()
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    writer.writerows(rows)
+    yield buffer.getvalue()
+
+
+class BlockReader(io.TextIOBase):
+    """Minimal file-like wrapper so copy_expert can pull from a generator of text blocks."""
+
+    def __init__(self, blocks):
+        self._blocks = blocks
+        self._buffer = ""
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            block = next(self._blocks, None)
+            if block is None:
+                break
+            self._buffer += block
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def copy_and_merge(conn, lines, taxi: str, filename: str, table: str, staging_table: str):
+    columns = ["unique_row_id", "filename", *COLUMNS[taxi]]
+    column_list = ", ".join(columns)
+
+    with conn.cursor() as cur:
+        cur.execute(f"TRUNCATE TABLE {staging_table}")
+
+        cur.copy_expert(
+            f"COPY {staging_table} ({column_list}) FROM STDIN WITH (FORMAT csv)",
+            BlockReader(staging_blocks(lines, taxi, filename))
+        )
+        print(f"Copied {cur.rowcount} rows into {staging_table}")
+
+        cur.execute(f"""
+            MERGE INTO {table} AS T
+            USING {staging_table} AS S
+            ON T.unique_row_id = S.unique_row_id
+            WHEN NOT MATCHED THEN
+              INSERT ({column_list})
+              VALUES ({", ".join(f"S.{c}" for c in columns)})
+        """)
+        print(f"Merged {cur.rowcount} new rows into {table}")
+
+
+@click.command()
+@click.option('--taxi', required=True, type=click.Choice(list(COLUMNS)), help='Taxi type')
+@click.option('--file', 'filename', required=True, help='CSV file name, e.g. yellow_tripdata_2019-01.csv')
+@click.option('--table', required=True, help='Final table, e.g. public.yellow_tripdata')
+@click.option('--staging-table', required=True, help='Staging table, e.g. public.yellow_tripdata_staging')
+@click.option('--pg-user', default='root', help='PostgreSQL user')
+@click.option('--pg-pass', default='root', help='PostgreSQL password')
+@click.option('--pg-host', default='pgdatabase', help='PostgreSQL host')
+@click.option('--pg-port', default='5432', help='PostgreSQL port')
+@click.option('--pg-db', default='ny_taxi', help='PostgreSQL database name')
+@click.option('--url-prefix', default=BASE_URL, help='URL prefix for data files')
+
+
+def main(taxi, filename, table, staging_table, pg_user, pg_pass, pg_host, pg_port, pg_db, url_prefix):
+    url = f"{url_prefix}/{taxi}/{filename}.gz"
+
+    with requests.get(url, stream=True, timeout=60) as r:
+        r.raise_for_status()
+        lines = io.TextIOWrapper(gzip.GzipFile(fileobj=r.raw), encoding="utf-8", newline="")
+
+        conn = psycopg2.connect(
+            user=pg_user, password=pg_pass, host=pg_host, port=pg_port, dbname=pg_db
+        )
+        try:
+            # One transaction: a failed download leaves the staging table untouched
+            with conn:
+                copy_and_merge(conn, lines, taxi, filename, table, staging_table)
+        finally:
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,9 @@
 import os
 import sys
+import functools
 import urllib.request
+import click
 from concurrent.futures import ThreadPoolExecutor
-from google.cloud import storage
-from google.api_core.exceptions import NotFound, Forbidden
 import time
 
 
@@ -11,13 +11,24 @@ import time
 # Change this to your bucket name
 BUCKET_NAME = "dtc-de-course-485215-hw3-bucket"
 
-# Initialize client - try service account file first, then fall back to default credentials
-CREDENTIALS_FILE = os.path.join('..', 'keys', 'service_credentials.json')
-if os.path.exists(CREDENTIALS_FILE):
-    client = storage.Client.from_service_account_json(CREDENTIALS_FILE)
-else:
+CREDENTIALS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'keys', 'service_credentials.json')
+
+
+@functools.cache
+def get_client():
+    # Created on first use so importing this module needs neither google-cloud nor credentials.
+    # Try service account file first, then fall back to default credentials
+    from google.cloud import storage
+
+    if os.path.exists(CREDENTIALS_FILE):
+        return storage.Client.from_service_account_json(CREDENTIALS_FILE)
     # If no service account file, use default credentials (requires gcloud auth application-default login)
-    client = storage.Client(project='dtc-de-course-485215')
+    return storage.Client(project='dtc-de-course-485215')
+
+
+@functools.cache
+def get_bucket():
+    return get_client().bucket(BUCKET_NAME)
 
 
 BASE_URL = "https://d37ci6vzurychx.cloudfront.net/trip-data/yellow_tripdata_2024-"
@@ -26,10 +37,6 @@ DOWNLOAD_DIR = "."
 
 CHUNK_SIZE = 8 * 1024 * 1024
 
-os.makedirs(DOWNLOAD_DIR, exist_ok=True)
-
-bucket = client.bucket(BUCKET_NAME)
-
 
 def download_file(month):
     url = f"{BASE_URL}{month}.parquet"
@@ -46,6 +53,9 @@ def download_file(month):
 
 
 def create_bucket(bucket_name):
+    from google.api_core.exceptions import NotFound, Forbidden
+
+    client = get_client()
     try:
         # Get bucket details
         bucket = client.get_bucket(bucket_name)
@@ -75,12 +85,12 @@ def create_bucket(bucket_name):
 
 
 def verify_gcs_upload(blob_name):
-    return storage.Blob(bucket=bucket, name=blob_name).exists(client)
+    return get_bucket().blob(blob_name).exists(get_client())
 
 
 def upload_to_gcs(file_path, max_retries=3):
     blob_name = os.path.basename(file_path)
-    blob = bucket.blob(blob_name)
+    blob = get_bucket().blob(blob_name)
     blob.chunk_size = CHUNK_SIZE
 
     create_bucket(BUCKET_NAME)
@@ -104,7 +114,16 @@ def upload_to_gcs(file_path, max_retries=3):
     print(f"Giving up on {file_path} after {max_retries} attempts.")
 
 
-if __name__ == "__main__":
+@click.command()
+@click.option('--dry-run', is_flag=True, help='Only list the files that would be downloaded and uploaded')
+def main(dry_run):
+    if dry_run:
+        for month in MONTHS:
+            print(f"{BASE_URL}{month}.parquet -> gs://{BUCKET_NAME}/yellow_tripdata_2024-{month}.parquet")
+        print(f"Dry run: {len(MONTHS)} files would be loaded to gs://{BUCKET_NAME}")
+        return
+
+    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
 
     print(f"Creating bucket {BUCKET_NAME}...")
     create_bucket(BUCKET_NAME)
@@ -118,3 +137,7 @@ if __name__ == "__main__":
         executor.map(upload_to_gcs, filter(None, file_paths))  # Remove None values
 
     print("All files processed and verified.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,9 @@
 import os
 import sys
 import glob
-import requests
-import pandas as pd
+import functools
+import click
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from google.cloud import storage
-from google.api_core.exceptions import NotFound, Forbidden
-from tqdm import tqdm
 import time
 
 """
@@ -18,19 +15,32 @@ INIT_URL = "https://github.com/DataTalksClub/nyc-tlc-data/releases/download/"
 YEARS = ["2019", "2020"]
 SERVICES = ["green", "yellow"]
 CHUNK_SIZE = 8 * 1024 * 1024
+ZONES_URL = f"{INIT_URL}misc/taxi_zone_lookup.csv"
 
-CREDENTIALS_FILE = os.path.join("..", "keys", "service_credentials.json")
-if os.path.exists(CREDENTIALS_FILE):
-    client = storage.Client.from_service_account_json(CREDENTIALS_FILE)
-else:
-    client = storage.Client(project="dtc-de-course-485215")
+CREDENTIALS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "keys", "service_credentials.json")
 
-bucket = client.bucket(BUCKET_NAME)
+
+@functools.cache
+def get_client():
+    """Create the GCS client on first use, so importing this module needs neither google-cloud nor credentials."""
+    from google.cloud import storage
+
+    if os.path.exists(CREDENTIALS_FILE):
+        return storage.Client.from_service_account_json(CREDENTIALS_FILE)
+    return storage.Client(project="dtc-de-course-485215")
+
+
+@functools.cache
+def get_bucket():
+    return get_client().bucket(BUCKET_NAME)
 
 
 def create_bucket_if_not_exists(bucket_name):
+    from google.api_core.exceptions import NotFound, Forbidden
+
+    client = get_client()
     try:
-        b = client.get_bucket(bucket_name)
+        client.get_bucket(bucket_name)
         project_bucket_ids = [x.id for x in client.list_buckets()]
         if bucket_name in project_bucket_ids:
             print(f"Bucket '{bucket_name}' exists.")
@@ -51,6 +61,8 @@ def create_bucket_if_not_exists(bucket_name):
 
 def _normalize_dtypes(df):
     """Normalize dtypes for BigQuery consistency."""
+    import pandas as pd
+
     if "passenger_count" in df.columns:
         df["passenger_count"] = pd.to_numeric(df["passenger_count"], errors="coerce").astype("float64")
     if "trip_type" in df.columns:
@@ -62,6 +74,8 @@ def _align_to_schema(df, schema):
     """Force df to have same columns and dtypes as reference schema (from {type}_2019-01).
     Integer columns use nullable Int64 so NA in other months is allowed.
     """
+    import pandas as pd
+
     cols = schema["columns"]
     dtypes = schema["dtypes"]
     df = df.reindex(columns=cols, fill_value=pd.NA)
@@ -82,11 +96,57 @@ def _align_to_schema(df, schema):
     return df
 
 
-def download_and_convert(service, year, month, reference_schema=None):
+def load_location_ids():
+    """Valid LocationIDs, read from the zone lookup CSV rather than assumed to be a fixed range."""
+    import pandas as pd
+
+    return pd.read_csv(ZONES_URL, usecols=["LocationID"])["LocationID"].to_numpy(dtype="float64")
+
+
+def _validation_masks(df, service, location_ids):
+    """Boolean NumPy masks, one per data-quality rule, True for rows failing it."""
+    import numpy as np
+    import pandas as pd
+
+    prefix = "lpep" if service == "green" else "tpep"
+    pickup = pd.to_datetime(df[f"{prefix}_pickup_datetime"], errors="coerce").to_numpy()
+    dropoff = pd.to_datetime(df[f"{prefix}_dropoff_datetime"], errors="coerce").to_numpy()
+    total = pd.to_numeric(df["total_amount"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+    def unknown_location(col):
+        ids = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        return ~np.isin(ids, location_ids)  # NaN (missing ID) is never in the lookup
+
+    return {
+        "null_vendor_id": df["VendorID"].isna().to_numpy(),
+        "dropoff_before_pickup": dropoff < pickup,
+        "negative_total_amount": total < 0,
+        "unknown_pu_location": unknown_location("PULocationID"),
+        "unknown_do_location": unknown_location("DOLocationID"),
+    }
+
+
+def _quarantine(df, service, location_ids):
+    """Split df into (valid, quarantined, per-rule counts); quarantined rows keep one flag column per rule."""
+    import numpy as np
+
+    masks = _validation_masks(df, service, location_ids)
+    failed = np.logical_or.reduce(list(masks.values()))
+    quarantined = df[failed].assign(**{rule: mask[failed] for rule, mask in masks.items()})
+    counts = {rule: int(mask.sum()) for rule, mask in masks.items()}
+    return df[~failed].reset_index(drop=True), quarantined.reset_index(drop=True), counts
+
+
+def download_and_convert(service, year, month, reference_schema=None, location_ids=None):
     """
     Download CSV.gz, convert to Parquet. If reference_schema is set (from {service}_2019-01),
-    align columns and dtypes to that schema.
+    align columns and dtypes to that schema. If location_ids is set (validation on), rows
+    failing _validation_masks go to a separate *_quarantine.parquet file.
     """
+    import pandas as pd
+    import requests
+    from tqdm import tqdm
+
     month_str = f"{month:02d}"
     csv_gz = f"{service}_tripdata_{year}-{month_str}.csv.gz"
     parquet_file = f"{service}_tripdata_{year}-{month_str}.parquet"
@@ -110,9 +170,17 @@ def download_and_convert(service, year, month, reference_schema=None):
         df = _normalize_dtypes(df)
         if reference_schema is not None:
             df = _align_to_schema(df, reference_schema)
+        quarantine_file = None
+        if location_ids is not None:
+            df, quarantined, counts = _quarantine(df, service, location_ids)
+            failed = ", ".join(f"{rule}={n}" for rule, n in counts.items() if n)
+            print(f"{service} {year}-{month_str}: quarantined {len(quarantined)} rows ({failed or 'none'})")
+            if len(quarantined):
+                quarantine_file = f"{service}_tripdata_{year}-{month_str}_quarantine.parquet"
+                quarantined.to_parquet(quarantine_file, engine="pyarrow")
         df.to_parquet(parquet_file, engine="pyarrow")
         os.remove(csv_gz)
-        return (service, year, month_str, parquet_file)
+        return (service, year, month_str, parquet_file, quarantine_file)
     except Exception as e:
         if os.path.exists(csv_gz):
             os.remove(csv_gz)
@@ -120,9 +188,9 @@ def download_and_convert(service, year, month, reference_schema=None):
         return None
 
 
-def upload_to_gcs(service, parquet_file, max_retries=3):
-    blob_name = f"{service}/{parquet_file}"
-    blob = bucket.blob(blob_name)
+def upload_to_gcs(service, parquet_file, max_retries=3, prefix=""):
+    blob_name = f"{prefix}{service}/{parquet_file}"
+    blob = get_bucket().blob(blob_name)
     blob.chunk_size = CHUNK_SIZE
     for attempt in range(max_retries):
         try:
@@ -134,6 +202,19 @@ def upload_to_gcs(service, parquet_file, max_retries=3):
     return False
 
 
+def plan_tasks():
+    """(service, year, month) to load: the 2019-01 reference months first, then the rest."""
+    reference = [(s, 2019, 1) for s in SERVICES]
+    rest = [
+        (s, int(y), m)
+        for s in SERVICES
+        for y in YEARS
+        for m in range(1, 13)
+        if (int(y), m) != (2019, 1)
+    ]
+    return reference, rest
+
+
 def cleanup_local_files():
     """Remove any leftover downloaded/converted files (parquet or csv.gz) from this run."""
     for pattern in (
@@ -150,17 +231,36 @@ def cleanup_local_files():
                 print(f"Could not remove {path}: {e}")
 
 
-if __name__ == "__main__":
+@click.command()
+@click.option("--validate/--no-validate", default=False, help="Move rows failing data-quality rules to *_quarantine.parquet files")
+@click.option("--dry-run", is_flag=True, help="Only list the files that would be downloaded and uploaded")
+def main(validate, dry_run):
+    reference_tasks, tasks = plan_tasks()
+
+    if dry_run:
+        for service, year, month in reference_tasks + tasks:
+            csv_gz = f"{service}_tripdata_{year}-{month:02d}.csv.gz"
+            parquet_file = f"{service}_tripdata_{year}-{month:02d}.parquet"
+            print(f"{INIT_URL}{service}/{csv_gz} -> gs://{BUCKET_NAME}/{service}/{parquet_file}")
+        print(f"Dry run: {len(reference_tasks) + len(tasks)} files would be loaded to gs://{BUCKET_NAME}")
+        return
+
+    # Imported here (and in the helpers above) so --help and --dry-run do not load pandas
+    import pandas as pd
+    from tqdm import tqdm
+
+    location_ids = load_location_ids() if validate else None
+
     try:
         create_bucket_if_not_exists(BUCKET_NAME)
 
         # Phase 1: build reference schema from {type}_tripdata_2019-01; upload and remove immediately
         schema_by_service = {}
         results = []
-        for service in SERVICES:
-            out = download_and_convert(service, 2019, 1, reference_schema=None)
+        for service, year, month in reference_tasks:
+            out = download_and_convert(service, year, month, reference_schema=None, location_ids=location_ids)
             if out is not None:
-                _, _, _, parquet_path = out
+                _, _, _, parquet_path, quarantine_path = out
                 ref_df = pd.read_parquet(parquet_path)
                 dtypes = ref_df.dtypes.to_dict()
                 # Use nullable Int64 for integer columns so other months with NA align without error
@@ -174,19 +274,15 @@ if __name__ == "__main__":
                 upload_to_gcs(service, parquet_path)
                 if os.path.exists(parquet_path):
                     os.remove(parquet_path)
+                if quarantine_path is not None:
+                    upload_to_gcs(service, quarantine_path, prefix="quarantine/")
+                    os.remove(quarantine_path)
                 print(f"Reference schema for {service}: {len(ref_df.columns)} columns (from 2019-01), uploaded")
 
         # Phase 2: all other (type, year, month) aligned to reference schema
-        tasks = [
-            (s, y, m)
-            for s in SERVICES
-            for y in YEARS
-            for m in range(1, 13)
-            if (y, m) != (2019, 1)
-        ]
         with ThreadPoolExecutor(max_workers=4) as executor:
             futures = {
-                executor.submit(download_and_convert, s, y, m, schema_by_service.get(s)): (s, y, m)
+                executor.submit(download_and_convert, s, y, m, schema_by_service.get(s), location_ids): (s, y, m)
                 for s, y, m in tasks
             }
             for fut in tqdm(as_completed(futures), total=len(futures), desc="Download+Convert"):
@@ -194,11 +290,18 @@ if __name__ == "__main__":
                 if r is not None:
                     results.append(r)
 
-        for service, year, month_str, parquet_file in tqdm(results, desc="Upload to GCS"):
+        for service, year, month_str, parquet_file, quarantine_file in tqdm(results, desc="Upload to GCS"):
             upload_to_gcs(service, parquet_file)
             if os.path.exists(parquet_file):
                 os.remove(parquet_file)
+            if quarantine_file is not None:
+                upload_to_gcs(service, quarantine_file, prefix="quarantine/")
+                os.remove(quarantine_file)
     finally:
         cleanup_local_files()
 
-    print("Done. Green and yellow 2019–2020 loaded to GCS (schema aligned to 2019-01 per type).")
\ No newline at end of file
+    print("Done. Green and yellow 2019–2020 loaded to GCS (schema aligned to 2019-01 per type).")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,70 +1,61 @@
-import duckdb
-import requests
+import click
+import importlib.util
 from pathlib import Path
 
 BASE_URL = "https://github.com/DataTalksClub/nyc-tlc-data/releases/download"
+PROJECT_DIR = Path(__file__).parent
+DATABASE = PROJECT_DIR / "taxi_rides_ny.duckdb"
+# The shared loader that also feeds PostgreSQL (module folders are not packages, so load it by path)
+PIPELINE_SCRIPT = PROJECT_DIR.parents[1] / "01-docker-terraform" / "pipeline" / "data_ingestion.py"
+TAXI_TYPES = ["yellow", "green"]
+YEARS = [2019, 2020]
+
+def plan_files(taxi_type):
+    """CSV.gz URLs loaded into prod.<taxi_type>_tripdata, in load order."""
+    return [
+        f"{BASE_URL}/{taxi_type}/{taxi_type}_tripdata_{year}-{month:02d}.csv.gz"
+        for year in YEARS
+        for month in range(1, 13)
+    ]
+
+def load_pipeline():
+    spec = importlib.util.spec_from_file_location("data_ingestion", PIPELINE_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+@click.command()
+@click.option('--chunksize', default=1000000, type=int, help='Rows per Arrow chunk handed to DuckDB')
+@click.option('--dry-run', is_flag=True, help='Only list the files that would be loaded')
+def main(chunksize, dry_run):
+    if dry_run:
+        total = 0
+        for taxi_type in TAXI_TYPES:
+            for url in plan_files(taxi_type):
+                print(f"{url} -> {DATABASE.name} prod.{taxi_type}_tripdata")
+                total += 1
+        print(f"Dry run: {total} files would be loaded into prod.yellow_tripdata and prod.green_tripdata")
+        return
+
+    pipeline = load_pipeline()
+
+    # Same ingest_data as the PostgreSQL loader: each Arrow chunk is inserted straight into DuckDB
+    con = pipeline.connect(f"duckdb:///{DATABASE}")
+    con.execute("CREATE SCHEMA IF NOT EXISTS prod")
 
-def download_and_convert_files(taxi_type):
-    data_dir = Path("data") / taxi_type
-    data_dir.mkdir(exist_ok=True, parents=True)
-
-    for year in [2019, 2020]:
-        for month in range(1, 13):
-            parquet_filename = f"{taxi_type}_tripdata_{year}-{month:02d}.parquet"
-            parquet_filepath = data_dir / parquet_filename
-
-            if parquet_filepath.exists():
-                print(f"Skipping {parquet_filename} (already exists)")
-                continue
-
-            # Download CSV.gz file
-            csv_gz_filename = f"{taxi_type}_tripdata_{year}-{month:02d}.csv.gz"
-            csv_gz_filepath = data_dir / csv_gz_filename
-
-            response = requests.get(f"{BASE_URL}/{taxi_type}/{csv_gz_filename}", stream=True)
-            response.raise_for_status()
-
-            with open(csv_gz_filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-
-            print(f"Converting {csv_gz_filename} to Parquet...")
-            con = duckdb.connect()
-            con.execute(f"""
-                COPY (SELECT * FROM read_csv_auto('{csv_gz_filepath}'))
-                TO '{parquet_filepath}' (FORMAT PARQUET)
-            """)
-            con.close()
-
-            # Remove the CSV.gz file to save space
-            csv_gz_filepath.unlink()
-            print(f"Completed {parquet_filename}")
-
-def update_gitignore():
-    gitignore_path = Path(".gitignore")
-
-    # Read existing content or start with empty string
-    content = gitignore_path.read_text() if gitignore_path.exists() else ""
+    for taxi_type in TAXI_TYPES:
+        for i, url in enumerate(plan_files(taxi_type)):
+            pipeline.ingest_data(
+                url=url,
+                engine=con,
+                target_table=f"prod.{taxi_type}_tripdata",
+                chunksize=chunksize,
+                taxi=taxi_type,
+                # The first month rebuilds the table, the rest are appended to it
+                if_exists="replace" if i == 0 else "append"
+            )
 
-    # Add data/ if not already present
-    if 'data/' not in content:
-        with open(gitignore_path, 'a') as f:
-            f.write('\n# Data directory\ndata/\n' if content else '# Data directory\ndata/\n')
+    con.close()
 
 if __name__ == "__main__":
-    # Update .gitignore to exclude data directory
-    update_gitignore()
-
-    for taxi_type in ["yellow", "green"]:
-        download_and_convert_files(taxi_type)
-
-    con = duckdb.connect("taxi_rides_ny.duckdb")
-    con.execute("CREATE SCHEMA IF NOT EXISTS prod")
-
-    for taxi_type in ["yellow", "green"]:
-        con.execute(f"""
-            CREATE OR REPLACE TABLE prod.{taxi_type}_tripdata AS
-            SELECT * FROM read_parquet('data/{taxi_type}/*.parquet', union_by_name=true)
-        """)
-
-    con.close()
\ No newline at end of file
+    main()
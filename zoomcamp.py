@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Single entry point for the course loaders.
+
+    python zoomcamp.py --help
+    python zoomcamp.py ingest-postgres --year 2021 --month 1 --dry-run
+    python zoomcamp.py --timings load-gcs --dry-run
+
+Each subcommand is the click command of an existing script. The script is only
+imported when its subcommand runs, so listing commands costs nothing and
+pandas, SQLAlchemy, DuckDB or google-cloud are only loaded by the command that
+needs them. Use --timings to see how long that import took (or
+`python -X importtime` for a per-module breakdown).
+"""
+
+import importlib.util
+import sys
+import time
+from pathlib import Path
+
+import click
+
+ROOT = Path(__file__).parent
+
+# name -> (script defining a click command called `main`, short help)
+COMMANDS = {
+    "ingest-postgres": (
+        "01-docker-terraform/pipeline/data_ingestion.py",
+        "Load a monthly yellow or green taxi CSV into PostgreSQL or DuckDB.",
+    ),
+    "ingest-zones": (
+        "01-docker-terraform/homework/zone_ingestion.py",
+        "Load the taxi zone lookup CSV into PostgreSQL.",
+    ),
+    "load-gcs-2024": (
+        "03-data-warehouse/load_yellow_taxi_data.py",
+        "Upload yellow January-June 2024 Parquet files to GCS.",
+    ),
+    "load-gcs": (
+        "04-analytics-engineering/load_data.py",
+        "Convert green/yellow 2019-2020 trips to Parquet and upload them to GCS.",
+    ),
+    "build-duckdb": (
+        "04-analytics-engineering/taxi_rides_ny/ingestion.py",
+        "Stream green/yellow 2019-2020 trips into the dbt DuckDB database.",
+    ),
+}
+
+
+def load_script(path: str):
+    """Import a script by path (the module folders are not importable packages)."""
+    module_name = Path(path).stem
+    spec = importlib.util.spec_from_file_location(module_name, ROOT / path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class LazyGroup(click.Group):
+    """click group that imports a subcommand's script only when it is invoked."""
+
+    def list_commands(self, ctx):
+        return list(COMMANDS)
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name not in COMMANDS:
+            return None
+
+        path, _ = COMMANDS[cmd_name]
+        start = time.perf_counter()
+        command = load_script(path).main
+        if ctx.params.get("timings"):
+            click.echo(f"Imported {path} in {time.perf_counter() - start:.2f}s", err=True)
+        return command
+
+    def format_commands(self, ctx, formatter):
+        # Use the static help above instead of importing every script
+        with formatter.section("Commands"):
+            formatter.write_dl([(name, help_text) for name, (_, help_text) in COMMANDS.items()])
+
+
+@click.group(cls=LazyGroup)
+@click.option('--timings', is_flag=True, help='Report how long importing the subcommand took')
+def cli(timings):
+    """Data Engineering Zoomcamp loaders."""
+
+
+if __name__ == '__main__':
+    cli()